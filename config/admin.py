@@ -2,13 +2,21 @@ from django.contrib import admin
 from .models import DataSource,Verification, VerificationTemplate, ImageModel
 from customadminsite.admin import myadminsite
 
+
+class ImageModelAdmin(admin.ModelAdmin):
+
+    def get_queryset(self, request):
+        # The changelist only shows ids, so don't load every image blob
+        return super().get_queryset(request).defer("image_data")
+
+
 # Register your models here.
 admin.site.register(DataSource)
 admin.site.register(Verification)
 admin.site.register(VerificationTemplate)
-admin.site.register(ImageModel)
+admin.site.register(ImageModel, ImageModelAdmin)
 
 myadminsite.register(DataSource)
 myadminsite.register(Verification)
 myadminsite.register(VerificationTemplate)
-myadminsite.register(ImageModel)
\ No newline at end of file
+myadminsite.register(ImageModel, ImageModelAdmin)
\ No newline at end of file
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.7 on 2026-10-16 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('config', '0007_imagemodel_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagemodel',
+            name='content_type',
+            field=models.CharField(default='image/jpeg', max_length=32),
+        ),
+    ]
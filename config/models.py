@@ -9,6 +9,10 @@ from jsonfield.fields import JSONField
 class ImageModel(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
     image_data = models.BinaryField()
+    digest = models.CharField(
+        max_length=64, unique=True, null=True, blank=True, editable=False
+    )
+    content_type = models.CharField(max_length=32, default="image/jpeg")
 
     def __str__(self):
         return str(self.id)
@@ -9,6 +9,20 @@ class VerificationSerializer(serializers.ModelSerializer):
                   'presentationState', 'presentationRecord']
 
 
+def empty_verification_data():
+    """
+    Return the data sent in place of VerificationSerializer data when a
+    data source has no verification yet.
+    """
+    return {
+        'id': '',
+        'dataSourceId': '',
+        'presentationExchangeId': '',
+        'presentationState': '',
+        'presentationRecord': {},
+    }
+
+
 class DataSourceSerializer(serializers.ModelSerializer):
     class Meta:
         model = DataSource
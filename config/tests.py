@@ -1,3 +1,168 @@
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from config.models import DataSource, ImageModel
+from config.views import PASSWORD_CHANGE_ATTEMPTS_LIMIT
+from onboard.models import DataspaceUser
+
+PNG_IMAGE = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+GIF_IMAGE = b"GIF89a" + b"\x00" * 32
+
+SUPPORTED_IMAGES = (
+    (b"\xff\xd8\xff\xe0" + b"\x00" * 32, "image/jpeg"),
+    (PNG_IMAGE, "image/png"),
+    (GIF_IMAGE, "image/gif"),
+    (b"RIFF\x00\x00\x00\x00WEBPVP8 ", "image/webp"),
+    (b"BM" + b"\x00" * 32, "image/bmp"),
+    (b"\x00\x00\x01\x00\x01\x00" + b"\x00" * 32, "image/x-icon"),
+    (b"II*\x00" + b"\x00" * 32, "image/tiff"),
+    (b"\x00\x00\x00\x1cftypavif" + b"\x00" * 16, "image/avif"),
+    (b"\x00\x00\x00\x18ftypheic" + b"\x00" * 16, "image/heic"),
+    (b'<svg xmlns="http://www.w3.org/2000/svg"/>', "image/svg+xml"),
+    (
+        b'<?xml version="1.0"?>\n<svg xmlns="http://www.w3.org/2000/svg"/>',
+        "image/svg+xml",
+    ),
+)
+
+
+def create_datasource(email):
+    admin = DataspaceUser.objects.create_user(email=email, password="password")
+    datasource = DataSource.objects.create(
+        admin=admin,
+        coverImageUrl="nil",
+        logoUrl="nil",
+        name=email,
+        sector="sector",
+        location="location",
+        policyUrl="https://example.com/policy",
+        description="description",
+    )
+    client = APIClient()
+    client.force_authenticate(user=admin)
+    return datasource, client
+
+
+def upload_cover_image(client, image_data):
+    return client.put(
+        "/config/data-source/coverimage/",
+        {"orgimage": SimpleUploadedFile("cover.png", image_data)},
+        format="multipart",
+    )
+
+
+class DataSourceImageTests(TestCase):
+
+    def test_upload_replaces_and_deletes_legacy_image(self):
+        datasource, client = create_datasource("first@example.com")
+        legacy_image = ImageModel.objects.create(image_data=GIF_IMAGE)
+        datasource.coverImageId = legacy_image.id
+        datasource.save()
+
+        response = upload_cover_image(client, PNG_IMAGE)
+
+        self.assertEqual(response.status_code, 200)
+        datasource.refresh_from_db()
+        image = ImageModel.objects.get(pk=datasource.coverImageId)
+        self.assertEqual(bytes(image.image_data), PNG_IMAGE)
+        self.assertEqual(image.content_type, "image/png")
+        self.assertFalse(ImageModel.objects.filter(pk=legacy_image.id).exists())
+
+    def test_identical_uploads_share_one_image(self):
+        first, first_client = create_datasource("first@example.com")
+        second, second_client = create_datasource("second@example.com")
+
+        upload_cover_image(first_client, PNG_IMAGE)
+        upload_cover_image(second_client, PNG_IMAGE)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.coverImageId, second.coverImageId)
+        self.assertEqual(ImageModel.objects.count(), 1)
+
+    def test_shared_image_is_deleted_with_its_last_reference(self):
+        first, first_client = create_datasource("first@example.com")
+        second, second_client = create_datasource("second@example.com")
+        upload_cover_image(first_client, PNG_IMAGE)
+        upload_cover_image(second_client, PNG_IMAGE)
+        second.refresh_from_db()
+        png_image_id = second.coverImageId
+
+        upload_cover_image(first_client, GIF_IMAGE)
+        self.assertTrue(ImageModel.objects.filter(pk=png_image_id).exists())
+
+        upload_cover_image(second_client, GIF_IMAGE)
+        self.assertFalse(ImageModel.objects.filter(pk=png_image_id).exists())
+        self.assertEqual(ImageModel.objects.count(), 1)
+        second.refresh_from_db()
+        response = self.client.get(f"/service/data-source/{second.id}/coverimage/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, GIF_IMAGE)
+        self.assertEqual(response["Content-Type"], "image/gif")
+
+        response = self.client.get(
+            f"/service/data-source/{second.id}/coverimage/",
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_accepts_supported_image_formats(self):
+        datasource, client = create_datasource("first@example.com")
+
+        for image_data, content_type in SUPPORTED_IMAGES:
+            with self.subTest(content_type=content_type):
+                response = upload_cover_image(client, image_data)
+
+                self.assertEqual(response.status_code, 200)
+                datasource.refresh_from_db()
+                image = ImageModel.objects.get(pk=datasource.coverImageId)
+                self.assertEqual(image.content_type, content_type)
+
+    def test_rejects_unsupported_file(self):
+        _, client = create_datasource("first@example.com")
+
+        response = upload_cover_image(client, b"not an image")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(ImageModel.objects.count(), 0)
+
+
+class PasswordChangeRateLimitTests(TestCase):
+
+    def setUp(self):
+        # Attempts are counted in the default cache, which outlives tests
+        cache.clear()
+
+    def change_password(self, client, new_password2):
+        return client.post(
+            "/config/admin/reset-password/",
+            {
+                "old_password": "password",
+                "new_password1": "n3w-Passw0rd!",
+                "new_password2": new_password2,
+            },
+        )
+
+    def test_rejects_attempts_over_the_limit(self):
+        _, client = create_datasource("first@example.com")
+        for _ in range(PASSWORD_CHANGE_ATTEMPTS_LIMIT):
+            response = self.change_password(client, "mismatch")
+            self.assertEqual(response.status_code, 400)
+
+        response = self.change_password(client, "n3w-Passw0rd!")
+
+        self.assertEqual(response.status_code, 429)
+        admin = DataspaceUser.objects.get(email="first@example.com")
+        self.assertTrue(admin.check_password("password"))
+
+    def test_counts_attempts_per_user(self):
+        _, first_client = create_datasource("first@example.com")
+        _, second_client = create_datasource("second@example.com")
+        for _ in range(PASSWORD_CHANGE_ATTEMPTS_LIMIT + 1):
+            self.change_password(first_client, "mismatch")
+
+        response = self.change_password(second_client, "n3w-Passw0rd!")
+
+        self.assertEqual(response.status_code, 200)
@@ -1,6 +1,10 @@
+import functools
+import json
 import os
 
 import requests
+from django.core.cache import cache
+from django.db import transaction
 from django.http import HttpResponse, JsonResponse
 from rest_auth.serializers import PasswordChangeSerializer
 from rest_auth.views import sensitive_post_parameters_m
@@ -14,26 +18,44 @@ from django.views.decorators.csrf import csrf_exempt
 
 from connection.models import Connection
 from dataspace_backend import settings
-from dataspace_backend.settings import (DATA_MARKETPLACE_APIKEY,
-                                        DATA_MARKETPLACE_DW_URL)
+from dataspace_backend.image_utils import (delete_image_if_unused,
+                                           get_image_response,
+                                           read_uploaded_image, store_image,
+                                           store_images)
+from dataspace_backend.settings import DATA_MARKETPLACE_DW_URL
+from dataspace_backend.utils import (digital_wallet_session, get_datasource_or_400,
+                                     invalidate_pagination_count)
 from onboard.serializers import DataspaceUserSerializer
 
-from .models import DataSource, ImageModel, Verification, VerificationTemplate
+from .models import DataSource, Verification, VerificationTemplate
 from .serializers import (DataSourceSerializer, VerificationSerializer,
-                          VerificationTemplateSerializer)
+                          VerificationTemplateSerializer, empty_verification_data)
 
 # Create your views here.
 
+# The deployment environment is fixed for the lifetime of the process
+URL_PROTOCOL = "https://" if os.environ.get("ENV") == "prod" else "http://"
+
+# Password change attempts allowed per user within the window (seconds)
+PASSWORD_CHANGE_ATTEMPTS_LIMIT = 5
+PASSWORD_CHANGE_ATTEMPTS_WINDOW = 60
+
+# Data source fields an admin can change through DataSourceView.put
+DATA_SOURCE_UPDATABLE_FIELDS = ("description", "location", "name", "policyUrl")
+
+DATA_AGREEMENT_OFFER_URL = (
+    f"{DATA_MARKETPLACE_DW_URL}/present-proof/data-agreement-negotiation/offer"
+)
+
 
 def construct_cover_image_url(
     baseurl: str,
     data_source_id: str,
     is_public_endpoint: bool = False
 ):
-    protocol = "https://" if os.environ.get("ENV") == "prod" else "http://"
     url_prefix = "service" if is_public_endpoint else "config"
     endpoint = f"/{url_prefix}/data-source/{data_source_id}/coverimage/"
-    return f"{protocol}{baseurl}{endpoint}"
+    return f"{URL_PROTOCOL}{baseurl}{endpoint}"
 
 
 def construct_logo_image_url(
@@ -41,28 +63,28 @@ def construct_logo_image_url(
     data_source_id: str,
     is_public_endpoint: bool = False
 ):
-    protocol = "https://" if os.environ.get("ENV") == "prod" else "http://"
     url_prefix = "service" if is_public_endpoint else "config"
     endpoint = f"/{url_prefix}/data-source/{data_source_id}/logoimage/"
-    return f"{protocol}{baseurl}{endpoint}"
+    return f"{URL_PROTOCOL}{baseurl}{endpoint}"
 
-def load_default_cover_image():
-    cover_image_path = os.path.join(settings.BASE_DIR, "resources","assets", "cover.jpeg")
+@functools.lru_cache(maxsize=None)
+def read_default_image(filename: str) -> bytes:
+    # Default assets don't change while the process runs, so read each once
+    image_path = os.path.join(settings.BASE_DIR, "resources", "assets", filename)
 
-    with open(cover_image_path, 'rb') as cover_image_file:
-        image_data = cover_image_file.read()
-        image = ImageModel(image_data=image_data)
-        image.save()
-        return image.id
+    with open(image_path, 'rb') as image_file:
+        return image_file.read()
 
-def load_default_logo_image():
-    logo_image_path = os.path.join(settings.BASE_DIR, "resources","assets", "logo.jpeg")
+def load_default_images(filenames):
+    return dict(
+        zip(filenames, store_images([read_default_image(f) for f in filenames]))
+    )
+
+def load_default_cover_image():
+    return load_default_images(["cover.jpeg"])["cover.jpeg"]
 
-    with open(logo_image_path, 'rb') as logo_image_file:
-        image_data = logo_image_file.read()
-        image = ImageModel(image_data=image_data)
-        image.save()
-        return image.id
+def load_default_logo_image():
+    return load_default_images(["logo.jpeg"])["logo.jpeg"]
     
 
 
@@ -92,17 +114,11 @@ class DataSourceView(APIView):
         serializer = self.serializer_class(data=request_data)
         if serializer.is_valid():
 
-            datasource = DataSource.objects.create(
-                admin=admin, **serializer.validated_data
-            )
+            # The id is generated client side, so the image URLs can be
+            # filled in before the row is inserted in a single save
+            datasource = DataSource(admin=admin, **serializer.validated_data)
 
             # Add default cover image and logo image URL
-            cover_image_id = load_default_cover_image()
-            logo_image_id = load_default_logo_image()
-            datasource.coverImageId = cover_image_id
-            datasource.logoId = logo_image_id
-            
-            # Update data source with cover and logo image URL
             datasource.coverImageUrl = construct_cover_image_url(
                 baseurl=request.get_host(),
                 data_source_id=str(datasource.id),
@@ -113,7 +129,14 @@ class DataSourceView(APIView):
                 data_source_id=str(datasource.id),
                 is_public_endpoint=True
             )
-            datasource.save()
+            with transaction.atomic():
+                # Keep the default images locked until the data source
+                # points at them
+                default_image_ids = load_default_images(["cover.jpeg", "logo.jpeg"])
+                datasource.coverImageId = default_image_ids["cover.jpeg"]
+                datasource.logoId = default_image_ids["logo.jpeg"]
+                datasource.save(force_insert=True)
+            invalidate_pagination_count(DataSource)
 
             # Serialize the created instance to match the response format
             response_serializer = self.serializer_class(datasource)
@@ -127,29 +150,20 @@ class DataSourceView(APIView):
 
     def get(self, request):
 
-        try:
-            datasource = DataSource.objects.get(admin=request.user)
-        except DataSource.DoesNotExist:
-            return JsonResponse(
-                {"error": "Data source not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
+        datasource, error_response = get_datasource_or_400(request.user)
+        if error_response is not None:
+            return error_response
 
         # Serialize the DataSource instance
         datasource_serializer = self.serializer_class(datasource)
 
-        try:
-            verification = Verification.objects.get(dataSourceId=datasource)
+        verification = Verification.objects.filter(dataSourceId=datasource).first()
+        if verification is not None:
             verification_serializer = self.verification_serializer_class(verification)
             verification_data = verification_serializer.data
-        except Verification.DoesNotExist:
+        else:
             # If no Verification exists, return empty data
-            verification_data = {
-                "id": "",
-                "dataSourceId": "",
-                "presentationExchangeId": "",
-                "presentationState": "",
-                "presentationRecord": {},
-            }
+            verification_data = empty_verification_data()
 
         # Construct the response data
         response_data = {
@@ -163,86 +177,91 @@ class DataSourceView(APIView):
         data = request.data.get("dataSource", {})
 
         # Get the DataSource instance associated with the current user
-        try:
-            datasource = DataSource.objects.get(admin=request.user)
-        except DataSource.DoesNotExist:
-            return JsonResponse(
-                {"error": "Data source not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
+        datasource, error_response = get_datasource_or_400(request.user)
+        if error_response is not None:
+            return error_response
 
         # Update the fields if they are not empty
-        if data.get("description"):
-            datasource.description = data["description"]
-        if data.get("location"):
-            datasource.location = data["location"]
-        if data.get("name"):
-            datasource.name = data["name"]
-        if data.get("policyUrl"):
-            datasource.policyUrl = data["policyUrl"]
+        updated_fields = []
+        for field in DATA_SOURCE_UPDATABLE_FIELDS:
+            value = data.get(field)
+            if value:
+                setattr(datasource, field, value)
+                updated_fields.append(field)
 
         # Save the updated DataSource instance
-        datasource.save()
+        if updated_fields:
+            datasource.save(update_fields=updated_fields)
 
         # Serialize the updated DataSource instance
         serializer = self.serializer_class(datasource)
         return JsonResponse({"dataSource": serializer.data}, status=status.HTTP_200_OK)
 
 
-class DataSourceCoverImageView(APIView):
+class DataSourceImageView(APIView):
+    """
+    Reads and uploads one of the images of the admin's data source.
+
+    Subclasses set which DataSource fields hold the image id and URL.
+    """
+
     permission_classes = [permissions.IsAuthenticated]
+    image_id_field = None
+    image_url_field = None
+    construct_image_url = None
+    not_found_message = None
 
     def get(self, request):
-        try:
-            # Get the DataSource instance
-            datasource = DataSource.objects.get(admin=request.user)
-        except DataSource.DoesNotExist:
-            return JsonResponse(
-                {"error": "Data source not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
-
-        try:
-            image = ImageModel.objects.get(pk=datasource.coverImageId)
-        except ImageModel.DoesNotExist:
-            return JsonResponse(
-                {"error": "Cover image not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
+        datasource, error_response = get_datasource_or_400(
+            request.user, only_fields=(self.image_id_field,)
+        )
+        if error_response is not None:
+            return error_response
 
         # Return the binary image data as the HTTP response
-        return HttpResponse(image.image_data, content_type="image/jpeg")
+        return get_image_response(
+            request, getattr(datasource, self.image_id_field), self.not_found_message
+        )
 
     def put(self, request):
 
         uploaded_image = request.FILES.get("orgimage")
 
-        try:
-            # Get the DataSource instance
-            datasource = DataSource.objects.get(admin=request.user)
-        except DataSource.DoesNotExist:
-            return JsonResponse(
-                {"error": "Data source not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
+        datasource, error_response = get_datasource_or_400(
+            request.user, only_fields=(self.image_id_field, self.image_url_field)
+        )
+        if error_response is not None:
+            return error_response
 
         if uploaded_image:
             # Read the binary data from the uploaded image file
-            image_data = uploaded_image.read()
-
-            if datasource.coverImageId is None:
-                image = ImageModel(image_data=image_data)
-                datasource.coverImageId = image.id
-            else:
-                # Save the binary image data to the database
-                image = ImageModel.objects.get(pk=datasource.coverImageId)
-                image.image_data = image_data
-
-            image.save()
-
-            datasource.coverImageUrl = construct_cover_image_url(
-                baseurl=request.get_host(),
-                data_source_id=str(datasource.id),
-                is_public_endpoint=True
+            try:
+                image_data = read_uploaded_image(uploaded_image)
+            except ValueError as e:
+                return JsonResponse(
+                    {"error": str(e)}, status=status.HTTP_400_BAD_REQUEST
+                )
+
+            # Images are shared by content, so point at the stored copy
+            # rather than overwriting the current one in place
+            previous_image_id = getattr(datasource, self.image_id_field)
+            setattr(
+                datasource,
+                self.image_url_field,
+                self.construct_image_url(
+                    baseurl=request.get_host(),
+                    data_source_id=str(datasource.id),
+                    is_public_endpoint=True
+                ),
             )
 
-            datasource.save()
+            # Keep the stored image locked until the data source points at it
+            with transaction.atomic():
+                setattr(datasource, self.image_id_field, store_image(image_data))
+                datasource.save(
+                    update_fields=[self.image_id_field, self.image_url_field]
+                )
+            delete_image_if_unused(previous_image_id)
 
             return JsonResponse({"message": "Image uploaded successfully"})
         else:
@@ -251,66 +270,18 @@ class DataSourceCoverImageView(APIView):
             )
 
 
-class DataSourceLogoImageView(APIView):
-    permission_classes = [permissions.IsAuthenticated]
-
-    def get(self, request):
-        try:
-            # Get the DataSource instance
-            datasource = DataSource.objects.get(admin=request.user)
-        except DataSource.DoesNotExist:
-            return JsonResponse(
-                {"error": "Data source not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
-
-        try:
-            image = ImageModel.objects.get(pk=datasource.logoId)
-        except ImageModel.DoesNotExist:
-            return JsonResponse(
-                {"error": "Logo image not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
+class DataSourceCoverImageView(DataSourceImageView):
+    image_id_field = "coverImageId"
+    image_url_field = "coverImageUrl"
+    construct_image_url = staticmethod(construct_cover_image_url)
+    not_found_message = "Cover image not found"
 
-        # Return the binary image data as the HTTP response
-        return HttpResponse(image.image_data, content_type="image/jpeg")
 
-    def put(self, request):
-
-        uploaded_image = request.FILES.get("orgimage")
-
-        try:
-            # Get the DataSource instance
-            datasource = DataSource.objects.get(admin=request.user)
-        except DataSource.DoesNotExist:
-            return JsonResponse(
-                {"error": "Data source not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
-
-        if uploaded_image:
-            # Read the binary data from the uploaded image file
-            image_data = uploaded_image.read()
-
-            if datasource.logoId is None:
-                image = ImageModel(image_data=image_data)
-                datasource.logoId = image.id
-            else:
-                # Save the binary image data to the database
-                image = ImageModel.objects.get(pk=datasource.logoId)
-                image.image_data = image_data
-
-            image.save()
-
-            datasource.logoUrl = construct_logo_image_url(
-                baseurl=request.get_host(),
-                data_source_id=str(datasource.id),
-                is_public_endpoint=True
-            )
-            datasource.save()
-
-            return JsonResponse({"message": "Image uploaded successfully"})
-        else:
-            return JsonResponse(
-                {"error": "No image file uploaded"}, status=status.HTTP_400_BAD_REQUEST
-            )
+class DataSourceLogoImageView(DataSourceImageView):
+    image_id_field = "logoId"
+    image_url_field = "logoUrl"
+    construct_image_url = staticmethod(construct_logo_image_url)
+    not_found_message = "Logo image not found"
 
 
 class AdminView(APIView):
@@ -341,12 +312,11 @@ class DataSourceVerificationView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        try:
-            datasource = DataSource.objects.get(admin=request.user)
-        except DataSource.DoesNotExist:
-            return JsonResponse(
-                {"error": "Data source not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
+        datasource, error_response = get_datasource_or_400(
+            request.user, only_fields=("id",)
+        )
+        if error_response is not None:
+            return error_response
 
         try:
             verification = Verification.objects.get(dataSourceId=datasource)
@@ -365,24 +335,26 @@ class DataSourceVerificationView(APIView):
         return JsonResponse(response_data)
 
     def post(self, request):
-        try:
-            datasource = DataSource.objects.get(admin=request.user)
-        except DataSource.DoesNotExist:
-            return JsonResponse(
-                {"error": "Data source not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
-
-        try:
-            connection = Connection.objects.get(dataSourceId=datasource, connectionState="active")
-        except Connection.DoesNotExist:
+        datasource, error_response = get_datasource_or_400(
+            request.user, only_fields=("id",)
+        )
+        if error_response is not None:
+            return error_response
+
+        # Only the wallet's connection id is sent on
+        connection = (
+            Connection.objects.filter(dataSourceId=datasource, connectionState="active")
+            .only("connectionId")
+            .first()
+        )
+        if connection is None:
             return JsonResponse(
                 {"error": "DISP Connection not found"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        try:
-            verificationTemplate = VerificationTemplate.objects.first()
-        except VerificationTemplate.DoesNotExist:
+        verificationTemplate = VerificationTemplate.objects.first()
+        if verificationTemplate is None:
             return JsonResponse(
                 {"error": "Verification template not found"},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -394,17 +366,13 @@ class DataSourceVerificationView(APIView):
             "connection_id": connection_id,
             "template_id": data_agreement_id,
         }
-        url = (
-            f"{DATA_MARKETPLACE_DW_URL}/present-proof/data-agreement-negotiation/offer"
-        )
-        authorization_header = DATA_MARKETPLACE_APIKEY
         try:
-            response = requests.post(
-                url, headers={"Authorization": authorization_header}, json=payload
+            response = digital_wallet_session.post(
+                DATA_AGREEMENT_OFFER_URL, json=payload
             )
             response.raise_for_status()
-            response = response.json()
-        except requests.exceptions.RequestException as e:
+            response = json.loads(response.content)
+        except (requests.exceptions.RequestException, ValueError) as e:
             return JsonResponse(
                 {"error": f"Error calling digital wallet: {str(e)}"},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -415,19 +383,14 @@ class DataSourceVerificationView(APIView):
         presentation_record = response
 
         # Update or create Verification object
-        try:
-            verification = Verification.objects.get(dataSourceId=datasource)
-            verification.presentationExchangeId = presentation_exchange_id
-            verification.presentationState = presentation_state
-            verification.presentationRecord = presentation_record
-            verification.save()
-        except Verification.DoesNotExist:
-            verification = Verification.objects.create(
-                dataSourceId=datasource,
-                presentationExchangeId=presentation_exchange_id,
-                presentationState=presentation_state,
-                presentationRecord=presentation_record,
-            )
+        verification, _ = Verification.objects.update_or_create(
+            dataSourceId=datasource,
+            defaults={
+                "presentationExchangeId": presentation_exchange_id,
+                "presentationState": presentation_state,
+                "presentationRecord": presentation_record,
+            },
+        )
 
         # Serialize the verification object
         verification_serializer = VerificationSerializer(verification)
@@ -445,31 +408,24 @@ class VerificationTemplateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        try:
-            datasource = DataSource.objects.get(admin=request.user)
-        except DataSource.DoesNotExist:
-            return JsonResponse(
-                {"error": "Data source not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
+        datasource, error_response = get_datasource_or_400(
+            request.user, only_fields=("name", "location")
+        )
+        if error_response is not None:
+            return error_response
 
-        try:
-            vt_objects = VerificationTemplate.objects.all()
-            vt_serialiser = self.serializer_class(
-                vt_objects, many=True
-            )
-            verification_templates = vt_serialiser.data
-            for verification_template in verification_templates:
-                verification_template["walletName"] = datasource.name
-                verification_template["walletLocation"] = datasource.location
-        except VerificationTemplate.DoesNotExist:
-            return JsonResponse(
-                {"error": "Verification templates not found"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+        vt_objects = VerificationTemplate.objects.all()
+        vt_serialiser = self.serializer_class(
+            vt_objects, many=True
+        )
+        verification_templates = vt_serialiser.data
+        for verification_template in verification_templates:
+            verification_template["walletName"] = datasource.name
+            verification_template["walletLocation"] = datasource.location
 
         # Construct the response data
         response_data = {
-            "verificationTemplates": vt_serialiser.data,
+            "verificationTemplates": verification_templates,
         }
 
         return JsonResponse(response_data)
@@ -483,12 +439,9 @@ class DataSourceOpenApiUrlView(APIView):
         data = request.data.get("dataSource", {})
 
         # Get the DataSource instance associated with the current user
-        try:
-            datasource = DataSource.objects.get(admin=request.user)
-        except DataSource.DoesNotExist:
-            return JsonResponse(
-                {"error": "Data source not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
+        datasource, error_response = get_datasource_or_400(request.user)
+        if error_response is not None:
+            return error_response
 
         # Update the fields if they are not empty
         if data.get("openApiUrl"):
@@ -499,7 +452,7 @@ class DataSourceOpenApiUrlView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
         # Save the updated DataSource instance
-        datasource.save()
+        datasource.save(update_fields=["openApiUrl"])
 
         # Serialize the updated DataSource instance
         serializer = self.serializer_class(datasource)
@@ -521,6 +474,24 @@ class PasswordChangeView(GenericAPIView):
         return super(PasswordChangeView, self).dispatch(*args, **kwargs)
 
     def post(self, request, *args, **kwargs):
+        # Checking the old password runs the (deliberately slow) password
+        # hasher, so bound how often a user can trigger it. The count is
+        # kept in the default cache, which is per process unless CACHES
+        # configures a shared backend
+        attempts_key = f"password-change-attempts:{request.user.pk}"
+        cache.add(attempts_key, 0, PASSWORD_CHANGE_ATTEMPTS_WINDOW)
+        try:
+            attempts = cache.incr(attempts_key)
+        except ValueError:
+            # The key expired between add() and incr(), so start a new window
+            cache.set(attempts_key, 1, PASSWORD_CHANGE_ATTEMPTS_WINDOW)
+            attempts = 1
+        if attempts > PASSWORD_CHANGE_ATTEMPTS_LIMIT:
+            return Response(
+                {"detail": "Too many password change attempts, try again later."},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+            )
+
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
@@ -534,6 +505,7 @@ def AdminReset(request):
     try:
         # Delete all connections
         Connection.objects.all().delete()
+        invalidate_pagination_count(Connection)
 
         # Delete all verifications
         Verification.objects.all().delete()
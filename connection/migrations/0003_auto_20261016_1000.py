@@ -0,0 +1,17 @@
+# Generated by Django 3.0.7 on 2026-10-16 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('connection', '0002_auto_20240402_0713'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='connection',
+            index=models.Index(fields=['dataSourceId', 'connectionState'], name='connection_source_state_idx'),
+        ),
+    ]
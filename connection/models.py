@@ -13,5 +13,13 @@ class Connection(models.Model):
     dataSourceId = models.ForeignKey(DataSource, on_delete=models.CASCADE)
     connectionRecord = JSONField(max_length=512)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["dataSourceId", "connectionState"],
+                name="connection_source_state_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.connectionId
\ No newline at end of file
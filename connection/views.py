@@ -3,39 +3,37 @@ from rest_framework.views import APIView
 from rest_framework import status, permissions
 from django.http import JsonResponse
 from .serializers import DISPConnectionSerializer
-from config.models import DataSource
 from .models import Connection
 from uuid import uuid4
-from dataspace_backend.utils import paginate_queryset
-from dataspace_backend.settings import DATA_MARKETPLACE_DW_URL, DATA_MARKETPLACE_APIKEY
+from dataspace_backend.utils import (digital_wallet_session, get_datasource_or_400,
+                                     invalidate_pagination_count, paginate_queryset)
+from dataspace_backend.settings import DATA_MARKETPLACE_DW_URL
+import json
+
 import requests
 
 # Create your views here.
 
+CREATE_INVITATION_URL = f"{DATA_MARKETPLACE_DW_URL}/v2/connections/create-invitation?multi_use=false&auto_accept=true"
+
 
 class DISPConnectionView(APIView):
     serializer_class = DISPConnectionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        try:
-            datasource = DataSource.objects.get(admin=request.user)
-        except DataSource.DoesNotExist:
-            return JsonResponse(
-                {"error": "Data source not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
+        datasource, error_response = get_datasource_or_400(
+            request.user, only_fields=("id",)
+        )
+        if error_response is not None:
+            return error_response
 
         # Call digital wallet to create connection
-        url = f"{DATA_MARKETPLACE_DW_URL}/v2/connections/create-invitation?multi_use=false&auto_accept=true"
-        authorization_header = DATA_MARKETPLACE_APIKEY
-
         try:
-            response = requests.post(
-                url, headers={"Authorization": authorization_header}
-            )
+            response = digital_wallet_session.post(CREATE_INVITATION_URL)
             response.raise_for_status()
-            response = response.json()
-        except requests.exceptions.RequestException as e:
+            response = json.loads(response.content)
+        except (requests.exceptions.RequestException, ValueError) as e:
             return JsonResponse(
                 {"error": f"Error calling digital wallet: {str(e)}"},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -45,14 +43,12 @@ class DISPConnectionView(APIView):
 
         url = f"{DATA_MARKETPLACE_DW_URL}/v1/connections/{connection_id}/invitation/firebase"
         try:
-            create_firebase_dynamic_link_response = requests.post(
-                url, headers={"Authorization": authorization_header}
-            )
+            create_firebase_dynamic_link_response = digital_wallet_session.post(url)
             create_firebase_dynamic_link_response.raise_for_status()
-            create_firebase_dynamic_link_response = (
-                create_firebase_dynamic_link_response.json()
+            create_firebase_dynamic_link_response = json.loads(
+                create_firebase_dynamic_link_response.content
             )
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, ValueError) as e:
             return JsonResponse(
                 {"error": f"Error creating Firebase dynamic link: {str(e)}"},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -69,6 +65,7 @@ class DISPConnectionView(APIView):
             connectionState="invitation",
             connectionRecord={},
         )
+        invalidate_pagination_count(Connection)
 
         connection_response_data = {
             "connectionId": connection_id,
@@ -98,30 +95,20 @@ class DISPConnectionsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        try:
-            datasource = DataSource.objects.get(admin=request.user)
-        except DataSource.DoesNotExist:
-            return JsonResponse(
-                {"error": "Data source not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
+        datasource, error_response = get_datasource_or_400(
+            request.user, only_fields=("id",)
+        )
+        if error_response is not None:
+            return error_response
 
+        connections = Connection.objects.filter(dataSourceId=datasource,connectionState = "active")
         try:
-            connections = Connection.objects.filter(dataSourceId=datasource,connectionState = "active")
             connections, pagination_data = paginate_queryset(connections, request)
-            serializer = DISPConnectionSerializer(connections, many=True)
-            connection_data = serializer.data
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        except Connection.DoesNotExist:
-            # If no connection exists, return empty data
-            connection_data = []
-            pagination_data = {
-                "currentPage": 0,
-                "totalItems": 0,
-                "totalPages": 0,
-                "limit": 0,
-                "hasPrevious": False,
-                "hasNext": False,
-            }
+        serializer = DISPConnectionSerializer(connections, many=True)
+        connection_data = serializer.data
 
         # Construct the response data
         response_data = {"connections": connection_data, "pagination": pagination_data}
@@ -134,18 +121,18 @@ class DISPDeleteConnectionView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def delete(self, request, connectionId):
-        try:
-            datasource = DataSource.objects.get(admin=request.user)
-        except DataSource.DoesNotExist:
-            return JsonResponse(
-                {"error": "Data source not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
+        datasource, error_response = get_datasource_or_400(
+            request.user, only_fields=("id",)
+        )
+        if error_response is not None:
+            return error_response
 
         try:
             connection = Connection.objects.get(
                 pk=connectionId, dataSourceId=datasource
             )
             connection.delete()
+            invalidate_pagination_count(Connection)
             return JsonResponse({}, status=status.HTTP_204_NO_CONTENT)
         except Connection.DoesNotExist:
             # If no connection exists, return error
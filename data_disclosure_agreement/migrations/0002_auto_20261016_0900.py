@@ -0,0 +1,21 @@
+# Generated by Django 3.0.7 on 2026-10-16 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_disclosure_agreement', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='datadisclosureagreement',
+            index=models.Index(fields=['templateId', 'isLatestVersion'], name='dda_template_latest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='datadisclosureagreement',
+            index=models.Index(fields=['dataSourceId', 'templateId', '-createdAt'], name='dda_source_template_idx'),
+        ),
+    ]
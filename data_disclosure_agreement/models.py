@@ -12,6 +12,16 @@ class DataDisclosureAgreement(models.Model):
     class Meta:
         verbose_name = "Data Disclosure Agreement - Manage Listing"
         verbose_name_plural = "Data Disclosure Agreement - Manage Listing"
+        indexes = [
+            models.Index(
+                fields=["templateId", "isLatestVersion"],
+                name="dda_template_latest_idx",
+            ),
+            models.Index(
+                fields=["dataSourceId", "templateId", "-createdAt"],
+                name="dda_source_template_idx",
+            ),
+        ]
 
     STATUS_CHOICES = [
         ("listed", "listed"),
@@ -47,35 +57,28 @@ class DataDisclosureAgreement(models.Model):
 
     @staticmethod
     def read_latest_dda_by_template_id_and_data_source_id(template_id: str, data_source_id: str) -> "DataDisclosureAgreement":
-        ddas = DataDisclosureAgreement.list_by_data_source_id(status="listed", templateId=template_id, data_source_id=data_source_id)
-        if (len(ddas) > 0):
-            return ddas[0]
-        else:
-            return None
+        # first() fetches just the newest row, rather than loading and
+        # decoding the record of every listed version
+        return DataDisclosureAgreement.list_by_data_source_id(
+            status="listed", templateId=template_id, data_source_id=data_source_id
+        ).first()
     
     @staticmethod
     def list_unique_dda_template_ids() -> typing.List[str]:
-        unique = []
-        ddas = DataDisclosureAgreement.objects.all()
-        for dda in ddas:
-            unique.append(dda.templateId)
-        return list(set(unique))
+        template_ids = DataDisclosureAgreement.objects.values_list(
+            "templateId", flat=True
+        ).distinct()
+        return list(template_ids)
     
     @staticmethod
     def list_unique_dda_template_ids_for_a_data_source(data_source_id, **kwargs) -> typing.List[str]:
-        unique_set = set()
-        ddas = DataDisclosureAgreement.list_by_data_source_id(data_source_id=data_source_id, **kwargs)
-        for dda in ddas:
-            unique_set.add(dda.templateId)
-        
-        # Convert set to list while preserving the order of insertion
-        unique_list = []
-        for item in ddas:
-            if item.templateId in unique_set:
-                unique_list.append(item.templateId)
-                unique_set.remove(item.templateId)
-        
-        return unique_list
+        # Only the template ids are needed, so avoid loading the records
+        template_ids = DataDisclosureAgreement.list_by_data_source_id(
+            data_source_id=data_source_id, **kwargs
+        ).values_list("templateId", flat=True)
+
+        # Deduplicate while preserving the order of insertion
+        return list(dict.fromkeys(template_ids))
 
     def __str__(self):
         return str(self.id)
@@ -7,12 +7,10 @@ def query_ddas_and_update_is_latest_flag_to_false_for_previous_versions(
     sender, instance, **kwargs
 ):
     if instance.isLatestVersion:
-        ddas = DataDisclosureAgreement.objects.filter(
+        # A single UPDATE, which also doesn't re-enter this handler
+        DataDisclosureAgreement.objects.filter(
             templateId=instance.templateId, isLatestVersion=True
-        ).exclude(pk=instance.id)
-        for dda in ddas:
-            dda.isLatestVersion = False
-            dda.save()
+        ).exclude(pk=instance.id).update(isLatestVersion=False)
 
 
 post_save.connect(
@@ -1,13 +1,9 @@
 from django.http import JsonResponse
 from rest_framework.views import APIView
 from rest_framework import status, permissions
-from config.models import DataSource
 from .models import DataDisclosureAgreement
-from .serializers import (
-    DataDisclosureAgreementSerializer,
-    DataDisclosureAgreementsSerializer,
-)
-from dataspace_backend.utils import paginate_queryset
+from .serializers import DataDisclosureAgreementSerializer
+from dataspace_backend.utils import get_datasource_or_400, paginate_queryset
 from django.db.models import Count
 
 # Create your views here.
@@ -19,25 +15,21 @@ class DataDisclosureAgreementView(APIView):
 
     def get(self, request, dataDisclosureAgreementId):
         version_param = request.query_params.get("version")
-        try:
-            datasource = DataSource.objects.get(admin=request.user)
-        except DataSource.DoesNotExist:
-            return JsonResponse(
-                {"error": "Data source not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
+        datasource, error_response = get_datasource_or_400(
+            request.user, only_fields=("id",)
+        )
+        if error_response is not None:
+            return error_response
 
-        try:
-            if version_param:
-                data_disclosure_agreement = DataDisclosureAgreement.objects.get(
-                    templateId=dataDisclosureAgreementId,
-                    dataSourceId=datasource,
-                    version=version_param,
-                )
-            else:
-                data_disclosure_agreement = DataDisclosureAgreement.objects.filter(
-                    templateId=dataDisclosureAgreementId, dataSourceId=datasource
-                ).last()
-        except DataDisclosureAgreement.DoesNotExist:
+        data_disclosure_agreements = DataDisclosureAgreement.objects.filter(
+            templateId=dataDisclosureAgreementId, dataSourceId=datasource
+        )
+        if version_param:
+            data_disclosure_agreements = data_disclosure_agreements.filter(
+                version=version_param
+            )
+        data_disclosure_agreement = data_disclosure_agreements.last()
+        if data_disclosure_agreement is None:
             return JsonResponse(
                 {"error": "Data Disclosure Agreement not found"},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -56,45 +48,33 @@ class DataDisclosureAgreementView(APIView):
         return JsonResponse(response_data)
 
     def delete(self, request, dataDisclosureAgreementId):
-        try:
-            datasource = DataSource.objects.get(admin=request.user)
-        except DataSource.DoesNotExist:
-            return JsonResponse(
-                {"error": "Data source not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
-
-        try:
-            data_disclosure_agreement_revisions = (
-                DataDisclosureAgreement.objects.filter(
-                    templateId=dataDisclosureAgreementId, dataSourceId=datasource
-                )
-            )
-        except DataDisclosureAgreement.DoesNotExist:
-            return JsonResponse(
-                {"error": "Data Disclosure Agreement not found"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+        datasource, error_response = get_datasource_or_400(
+            request.user, only_fields=("id",)
+        )
+        if error_response is not None:
+            return error_response
 
         # Delete the data disclosure agreement
-        data_disclosure_agreement_revisions.delete()
+        DataDisclosureAgreement.objects.filter(
+            templateId=dataDisclosureAgreementId, dataSourceId=datasource
+        ).delete()
 
         return JsonResponse({}, status=status.HTTP_204_NO_CONTENT)
 
 
 class DataDisclosureAgreementsView(APIView):
-    serializer_class = DataDisclosureAgreementsSerializer
+    serializer_class = DataDisclosureAgreementSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
         # Get the 'status' query parameter
         status_param = request.query_params.get("status")
 
-        try:
-            datasource = DataSource.objects.get(admin=request.user)
-        except DataSource.DoesNotExist:
-            return JsonResponse(
-                {"error": "Data source not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
+        datasource, error_response = get_datasource_or_400(
+            request.user, only_fields=("id",)
+        )
+        if error_response is not None:
+            return error_response
 
         data_disclosure_agreements_template_ids = (
             DataDisclosureAgreement.list_unique_dda_template_ids_for_a_data_source(
@@ -102,46 +82,34 @@ class DataDisclosureAgreementsView(APIView):
             )
         )
 
-        ddas = []
-
+        # With a status, list the latest DDA in that status for each
+        # template, otherwise the latest version of each template
         if status_param:
-            temp_dda = {}
-            for dda_template_id in data_disclosure_agreements_template_ids:
-                latest_dda_for_template_id = (
-                    DataDisclosureAgreement.objects.filter(
-                        templateId=dda_template_id,
-                        dataSourceId=datasource,
-                        status=status_param,
-                    )
-                    .order_by("-createdAt")
-                    .first()
-                )
-                
-                serializer = self.serializer_class(latest_dda_for_template_id)
-                temp_dda = serializer.data["dataDisclosureAgreementRecord"]
-
-                if temp_dda:
-                    temp_dda['status'] = serializer.data['status']
-                    temp_dda['isLatestVersion'] = serializer.data['isLatestVersion']
-                    ddas.append(temp_dda)
+            dda_filter = {"status": status_param}
         else:
-            temp_dda = {}
-            for dda_template_id in data_disclosure_agreements_template_ids:
-                latest_dda_for_template_id = (
-                    DataDisclosureAgreement.objects.filter(
-                        templateId=dda_template_id,
-                        dataSourceId=datasource,
-                        isLatestVersion=True,
-                    )
-                    .order_by("-createdAt")
-                    .first()
+            dda_filter = {"isLatestVersion": True}
+
+        ddas = []
+        for dda_template_id in data_disclosure_agreements_template_ids:
+            latest_dda_for_template_id = (
+                DataDisclosureAgreement.objects.filter(
+                    templateId=dda_template_id,
+                    dataSourceId=datasource,
+                    **dda_filter,
                 )
-                serializer = self.serializer_class(latest_dda_for_template_id)
-                temp_dda = serializer.data["dataDisclosureAgreementRecord"]
-                if temp_dda:
-                    temp_dda['status'] = serializer.data['status']
-                    temp_dda['isLatestVersion'] = serializer.data['isLatestVersion']
-                    ddas.append(temp_dda)
+                .only(*self.serializer_class.Meta.fields)
+                .order_by("-createdAt")
+                .first()
+            )
+
+            # serializer.data builds a new dict on every access
+            serializer_data = self.serializer_class(latest_dda_for_template_id).data
+            temp_dda = serializer_data["dataDisclosureAgreementRecord"]
+
+            if temp_dda:
+                temp_dda['status'] = serializer_data['status']
+                temp_dda['isLatestVersion'] = serializer_data['isLatestVersion']
+                ddas.append(temp_dda)
 
         ddas, pagination_data = paginate_queryset(ddas, request)
 
@@ -152,17 +120,19 @@ class DataDisclosureAgreementsView(APIView):
         return JsonResponse(response_data)
 
 
+# Status transitions an admin is allowed to make, as (current, to be updated)
+ALLOWED_DDA_STATUS_TRANSITIONS = frozenset(
+    [
+        ("unlisted", "awaitingForApproval"),
+        ("approved", "listed"),
+        ("rejected", "awaitingForApproval"),
+        ("listed", "unlisted"),
+    ]
+)
+
+
 def validate_update_dda_request_body(to_be_updated_status: str, current_status: str):
-    if current_status == "unlisted" and to_be_updated_status == "awaitingForApproval":
-        return True
-    elif current_status == "approved" and to_be_updated_status == "listed":
-        return True
-    elif current_status == "rejected" and to_be_updated_status == "awaitingForApproval":
-        return True
-    elif current_status == "listed" and to_be_updated_status == "unlisted":
-        return True
-    else:
-        return False
+    return (current_status, to_be_updated_status) in ALLOWED_DDA_STATUS_TRANSITIONS
 
 
 class DataDisclosureAgreementUpdateView(APIView):
@@ -172,12 +142,11 @@ class DataDisclosureAgreementUpdateView(APIView):
 
         to_be_updated_status = request.data.get("status")
 
-        try:
-            datasource = DataSource.objects.get(admin=request.user)
-        except DataSource.DoesNotExist:
-            return JsonResponse(
-                {"error": "Data source not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
+        datasource, error_response = get_datasource_or_400(
+            request.user, only_fields=("id",)
+        )
+        if error_response is not None:
+            return error_response
 
         try:
             data_disclosure_agreement = DataDisclosureAgreement.objects.get(
@@ -201,7 +170,9 @@ class DataDisclosureAgreementUpdateView(APIView):
             dda_record["status"] = to_be_updated_status
             data_disclosure_agreement.status = to_be_updated_status
             data_disclosure_agreement.dataDisclosureAgreementRecord = dda_record
-            data_disclosure_agreement.save()
+            data_disclosure_agreement.save(
+                update_fields=["status", "dataDisclosureAgreementRecord"]
+            )
             
             return JsonResponse({}, status=status.HTTP_204_NO_CONTENT)
         else:
@@ -2,6 +2,8 @@ import json
 
 from django.forms import fields, widgets
 
+__all__ = ["JsonField"]
+
 
 class JsonField(fields.CharField):
     widget = widgets.Textarea
@@ -16,10 +18,20 @@ class JsonField(fields.CharField):
         return attrs
 
     def to_python(self, value):
-        if value:
-            return json.loads(value)
-        else:
+        if isinstance(value, (dict, list)):
+            # Already parsed, skip the round-trip
+            return value
+        value = value.strip() if value else ""
+        if not value or value == "{}":
             return {}
+        if value == "[]":
+            return []
+        return json.loads(value)
 
     def prepare_value(self, value):
+        if value is None:
+            return ""
+        if isinstance(value, str):
+            # Redisplayed form input is already serialised JSON
+            return value
         return json.dumps(value)
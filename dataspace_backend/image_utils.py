@@ -0,0 +1,190 @@
+import hashlib
+import typing
+
+from django.db import transaction
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from rest_framework import status
+
+from config.models import DataSource, ImageModel
+
+MAX_IMAGE_UPLOAD_SIZE = 2 * 1024 * 1024
+
+# Image URLs are stable per data source while their content can change,
+# so keep this short and rely on ETag revalidation
+IMAGE_CACHE_MAX_AGE = 60
+
+# Leading bytes of the image formats accepted for upload
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+    (b"\x00\x00\x01\x00", "image/x-icon"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+)
+
+# ISO base media file brands of the AVIF and HEIF image formats
+ISOBMFF_IMAGE_BRANDS = {
+    b"avif": "image/avif",
+    b"avis": "image/avif",
+    b"heic": "image/heic",
+    b"heix": "image/heic",
+    b"mif1": "image/heif",
+}
+
+# SVG is text, so look for its root element near the start of the file
+SVG_SNIFF_LENGTH = 1024
+
+
+def guess_image_content_type(image_data: bytes) -> typing.Optional[str]:
+    """
+    Return the content type of an image from its magic bytes, or None if
+    it isn't a supported image format.
+    """
+    for signature, content_type in IMAGE_SIGNATURES:
+        if image_data.startswith(signature):
+            return content_type
+    # WebP is a RIFF container with the format at offset 8
+    if image_data[:4] == b"RIFF" and image_data[8:12] == b"WEBP":
+        return "image/webp"
+    if image_data[4:8] == b"ftyp" and image_data[8:12] in ISOBMFF_IMAGE_BRANDS:
+        return ISOBMFF_IMAGE_BRANDS[image_data[8:12]]
+    head = image_data[:SVG_SNIFF_LENGTH].lstrip(b"\xef\xbb\xbf \t\r\n")
+    if head.startswith((b"<?xml", b"<svg", b"<!DOCTYPE svg")) and b"<svg" in head:
+        return "image/svg+xml"
+    return None
+
+
+def read_uploaded_image(uploaded_image) -> bytes:
+    """
+    Read an uploaded image file, rejecting it if it exceeds
+    MAX_IMAGE_UPLOAD_SIZE or isn't a supported image format.
+    """
+    # Django's upload handlers have already received the whole file and
+    # set its size, so this only saves reading an oversized file back
+    if uploaded_image.size > MAX_IMAGE_UPLOAD_SIZE:
+        raise ValueError("Image file too large")
+
+    image_data = uploaded_image.read()
+    if guess_image_content_type(image_data) is None:
+        raise ValueError("Unsupported image file")
+
+    return image_data
+
+
+def get_image_response(request, image_id, not_found_message: str):
+    """
+    Return a stored image to the client, or a 400 with
+    not_found_message if it doesn't exist.
+
+    Images with a digest are served with it as ETag, so clients holding
+    the current image get a 304 without the blob being read.
+    """
+    if "HTTP_IF_NONE_MATCH" in request.META:
+        fields = ("digest", "content_type")
+    else:
+        # Nothing to revalidate, so read the blob in the same query
+        fields = ("digest", "content_type", "image_data")
+    image = ImageModel.objects.only(*fields).filter(pk=image_id).first()
+    if image is None:
+        return JsonResponse(
+            {"error": not_found_message}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    etag = quote_etag(image.digest) if image.digest else None
+    if etag:
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            response["ETag"] = etag
+            patch_cache_control(response, max_age=IMAGE_CACHE_MAX_AGE)
+            return response
+
+    response = HttpResponse(image.image_data, content_type=image.content_type)
+    if image.content_type == "image/svg+xml":
+        # Don't run scripts embedded in an SVG opened directly
+        response["Content-Security-Policy"] = (
+            "default-src 'none'; style-src 'unsafe-inline'; sandbox"
+        )
+    if etag:
+        response["ETag"] = etag
+    patch_cache_control(response, max_age=IMAGE_CACHE_MAX_AGE)
+    return response
+
+
+def store_image(image_data: bytes):
+    """
+    Store image bytes and return the image id, reusing the existing row
+    when identical bytes have already been stored.
+
+    See store_images for the transaction this must be called in.
+    """
+    return store_images([image_data])[0]
+
+
+def store_images(images: typing.List[bytes]) -> list:
+    """
+    Store several images at once and return their ids in the same order,
+    reusing rows for bytes that are already stored.
+
+    Missing images are inserted with a single bulk INSERT.
+
+    The returned rows stay locked until the caller's transaction commits,
+    so call this inside transaction.atomic() together with the save that
+    points a data source at them. delete_image_if_unused takes the same
+    lock, so it can't delete a row between here and that save.
+    """
+    digests = [hashlib.sha256(image_data).hexdigest() for image_data in images]
+    image_ids = _lock_images_by_digest(digests)
+
+    missing = {}
+    for digest, image_data in zip(digests, images):
+        if digest not in image_ids and digest not in missing:
+            missing[digest] = ImageModel(
+                image_data=image_data,
+                digest=digest,
+                content_type=guess_image_content_type(image_data) or "image/jpeg",
+            )
+    if missing:
+        # A concurrent request may store the same bytes first, so ignore
+        # conflicts and read back the ids that actually got stored
+        ImageModel.objects.bulk_create(missing.values(), ignore_conflicts=True)
+        image_ids.update(_lock_images_by_digest(list(missing)))
+
+    return [image_ids[digest] for digest in digests]
+
+
+def _lock_images_by_digest(digests):
+    return dict(
+        ImageModel.objects.select_for_update()
+        .filter(digest__in=digests)
+        .values_list("digest", "id")
+    )
+
+
+def delete_image_if_unused(image_id):
+    """
+    Delete an image once no data source refers to it as cover or logo.
+
+    Call this after the transaction that moved a data source off the
+    image has committed. Holding the new image's lock while taking this
+    one could deadlock with an upload going the other way.
+    """
+    if image_id is None:
+        return
+    with transaction.atomic():
+        # Lock the row first, so store_images can't hand it out again
+        # until the references have been checked
+        if not list(
+            ImageModel.objects.select_for_update().filter(pk=image_id).values_list("id")
+        ):
+            return
+        in_use = DataSource.objects.filter(
+            Q(coverImageId=image_id) | Q(logoId=image_id)
+        ).exists()
+        if not in_use:
+            ImageModel.objects.filter(pk=image_id).delete()
@@ -1,27 +1,300 @@
-def paginate_queryset(queryset, request):
-    offset = request.GET.get('offset')
-    limit = request.GET.get('limit')
+import base64
+import binascii
+import functools
+import hashlib
+import json
+from uuid import uuid4
 
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.db import connections
+from django.db.models import Count, F, Q, QuerySet, Window
+from django.http import HttpResponse
+from rest_framework import status
+
+from config.models import DataSource
+from dataspace_backend.settings import DATA_MARKETPLACE_APIKEY
+
+__all__ = [
+    "digital_wallet_session",
+    "get_datasource_or_400",
+    "get_instance_or_400",
+    "get_model_by_admin_or_400",
+    "invalidate_pagination_count",
+    "paginate_queryset",
+    "paginate_queryset_keyset",
+]
+
+# Shared session for digital wallet calls, so the authorization header is
+# set up once and connections are pooled across requests
+digital_wallet_session = requests.Session()
+digital_wallet_session.headers["Authorization"] = DATA_MARKETPLACE_APIKEY
+
+
+@functools.lru_cache(maxsize=None)
+def _not_found_body(message):
+    return json.dumps({"error": message}).encode()
+
+
+def _not_found_response(message):
+    # The messages are constants, so serialise each body only once
+    return HttpResponse(
+        _not_found_body(message),
+        status=status.HTTP_400_BAD_REQUEST,
+        content_type="application/json",
+    )
+
+
+def get_model_by_admin_or_400(model, user, not_found_message="Not found", only_fields=None):
+    """
+    Return (instance, None) for the model instance administered by user,
+    or (None, 400 response) if there is none.
+
+    Pass only_fields to load just those columns, e.g. ("id",) when the
+    instance is only used to scope other queries.
+    """
+    queryset = model.objects.filter(admin=user)
+    if only_fields:
+        queryset = queryset.only(*only_fields)
+    # filter().first() runs the same query as get() without raising on a miss
+    instance = queryset.first()
+    if instance is None:
+        return None, _not_found_response(not_found_message)
+    return instance, None
+
+
+def get_instance_or_400(model, pk, not_found_message="Not found"):
+    """
+    Return (instance, None) for the model instance with primary key pk,
+    or (None, 400 response) if there is none.
+    """
     try:
-        offset = int(offset)
-    except (ValueError,TypeError):
-        offset = 0
+        instance = model.objects.filter(pk=pk).first()
+    except (ValueError, ValidationError):
+        # Malformed primary keys can't match any row
+        instance = None
+    if instance is None:
+        return None, _not_found_response(not_found_message)
+    return instance, None
+
+
+def get_datasource_or_400(user, only_fields=None):
+    """
+    Return (datasource, None) for the data source administered by user,
+    or (None, 400 response) if there is none.
+    """
+    return get_model_by_admin_or_400(
+        DataSource, user, "Data source not found", only_fields=only_fields
+    )
+
+
+# Seconds a paginated queryset's total is reused before it is recounted
+PAGINATION_COUNT_CACHE_TIMEOUT = 30
+
+# Cache backends private to each process. Invalidating a total there
+# would only reach the worker that wrote, so totals aren't cached
+PROCESS_LOCAL_CACHE_BACKENDS = frozenset(
+    {
+        "django.core.cache.backends.dummy.DummyCache",
+        "django.core.cache.backends.locmem.LocMemCache",
+    }
+)
+
+
+def _pagination_count_cache_enabled():
+    """
+    Return whether pagination totals are cached, which they are only
+    when the default cache is shared between processes.
+    """
+    return settings.CACHES["default"]["BACKEND"] not in PROCESS_LOCAL_CACHE_BACKENDS
+
+
+def _pagination_count_version_key(model):
+    return f'pg:count:version:{model._meta.label_lower}'
 
+
+def _count_cache_key(queryset):
+    # None when the query can't match any rows
     try:
-        limit = int(limit)
-    except (ValueError,TypeError):
-        limit = 10
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return None
+
+    # The per-model version makes invalidation drop every cached total
+    version = cache.get_or_set(
+        _pagination_count_version_key(queryset.model), lambda: uuid4().hex, None
+    )
+    digest = hashlib.blake2b(
+        f'{version}:{sql}:{params!r}'.encode(), digest_size=16
+    ).hexdigest()
+    return f'pg:count:{digest}'
+
+
+def invalidate_pagination_count(model):
+    """
+    Drop the cached pagination totals of every queryset over model.
+
+    Views that add, remove or change the state of listed rows call this
+    after writing. Cascade deletes don't call it, so their totals are
+    picked up once PAGINATION_COUNT_CACHE_TIMEOUT expires.
+    """
+    cache.set(_pagination_count_version_key(model), uuid4().hex, None)
+
+
+def _parse_int(value, default, lo=None, hi=None):
+    """
+    Parse an integer query parameter clamped to [lo, hi], falling back to
+    default when it is missing or not an integer.
+    """
+    if value is None:
+        return default
+    digits = value[1:] if value.startswith('-') else value
+    # isdecimal() accepts exactly the digits int() does, so invalid input
+    # never goes through a raised ValueError
+    if not digits.isdecimal():
+        return default
+    value = int(value)
+    if lo is not None:
+        value = max(value, lo)
+    if hi is not None:
+        value = min(value, hi)
+    return value
+
+
+def _slice_queryset(queryset, start, stop):
+    if isinstance(queryset, QuerySet):
+        # Slice over primary keys only, so the database skips `offset`
+        # index entries rather than `offset` full rows, then fetch the
+        # full rows for just this page
+        ordering = queryset.query.order_by or queryset.model._meta.ordering or ['pk']
+        page_pks = queryset.order_by(*ordering).values('pk')[start:stop]
+        return queryset.filter(pk__in=page_pks).order_by(*ordering)
+    return queryset[start:stop]
+
+
+def _can_fetch_page_with_count(queryset):
+    query = queryset.query
+    return (
+        connections[queryset.db].features.supports_over_clause
+        and not query.distinct
+        and not query.values_select
+    )
+
+
+def _fetch_page_with_count(queryset, start, stop):
+    """
+    Fetch a page of model instances together with the total row count,
+    read from COUNT(*) OVER () in the same query. The total is None when
+    the page is empty.
+    """
+    ordering = queryset.query.order_by or queryset.model._meta.ordering or ['pk']
+    rows = list(
+        queryset.order_by(*ordering)
+        .annotate(_total=Window(expression=Count('*')))[start:stop]
+    )
+    if not rows:
+        return rows, None
+    total_items = rows[0]._total
+    for row in rows:
+        del row._total
+    return rows, total_items
+
+
+def paginate_queryset(queryset, request, exact_count=True):
+    """
+    Return one page of queryset (a QuerySet or list) selected by the
+    `offset` and `limit` query parameters, with its pagination data.
+
+    With exact_count=False no COUNT query is run. One extra row is
+    fetched to tell whether there is a next page, and currentPage,
+    totalItems and totalPages are None. Use it where clients only need
+    to page forwards. Clients can ask for this themselves by sending
+    `mode=probe`.
+
+    A QuerySet is paginated with paginate_queryset_keyset instead when
+    the request has `mode=keyset` or an `after` cursor. That raises
+    ValueError for a malformed cursor.
+
+    When the request has `stream=1`, a QuerySet page is returned as an
+    iterator that fetches rows in chunks instead of caching them all, so
+    callers must only loop over it once.
+
+    Totals are cached for PAGINATION_COUNT_CACHE_TIMEOUT seconds when a
+    shared cache is configured (see _pagination_count_cache_enabled).
+    Except for streamed pages, one extra row is fetched so hasNext stays
+    exact even when the cached total is out of date.
+
+    A QuerySet page is normally sliced over primary keys first (see
+    _slice_queryset). The exception is a request without `stream=1` whose
+    total isn't cached. Where the database supports window functions,
+    that page is read with a plain OFFSET in the same query as its total.
+    This saves a COUNT round trip at the cost of the cheaper deep offset.
+    """
+    # Works for both DRF and plain Django requests
+    params = getattr(request, 'query_params', request.GET)
+
+    if params.get('mode') == 'probe':
+        exact_count = False
+
+    # Clients opting in with `mode=keyset` or sending an `after` cursor
+    # get keyset pagination
+    keyset = params.get('mode') == 'keyset' or 'after' in params
+    if keyset and isinstance(queryset, QuerySet):
+        return paginate_queryset_keyset(queryset, request)
+
+    offset = _parse_int(params.get('offset'), 0, lo=0)
+    limit = _parse_int(params.get('limit'), 10, lo=1, hi=100)
+
+    if not exact_count:
+        rows = list(_slice_queryset(queryset, offset, offset + limit + 1))
+        pagination_data = {
+            'currentPage': None,
+            'totalItems': None,
+            'totalPages': None,
+            'limit': limit,
+            'hasPrevious': offset > 0,
+            'hasNext': len(rows) > limit,
+        }
+        return rows[:limit], pagination_data
+
+    stream = params.get('stream') == '1'
 
     # Total items in the queryset
-    try:
-        total_items = queryset.count()
-    except TypeError:
+    page = None
+    total_items = None
+    count_key = None
+    if isinstance(queryset, QuerySet):
+        if _pagination_count_cache_enabled():
+            count_key = _count_cache_key(queryset)
+            total_items = cache.get(count_key) if count_key else 0
+        if total_items is None:
+            # Read the total alongside the page in one query where the
+            # database supports window functions. A streamed page is
+            # fetched separately, so it stays an iterator
+            if not stream and _can_fetch_page_with_count(queryset):
+                page, total_items = _fetch_page_with_count(
+                    queryset, offset, offset + limit + 1
+                )
+            if total_items is None:
+                total_items = queryset.count()
+            if count_key:
+                cache.set(count_key, total_items, PAGINATION_COUNT_CACHE_TIMEOUT)
+    else:
         total_items = len(queryset)
 
-    offset = max(offset, 0)
-    limit = max(0, min(limit, 100))  
-
-    queryset = queryset[offset:offset + limit]
+    if stream and page is None and isinstance(queryset, QuerySet):
+        page = _slice_queryset(queryset, offset, offset + limit)
+        page = page.iterator(chunk_size=min(limit, 200))
+        has_next = offset + limit < total_items
+    else:
+        if page is None:
+            page = list(_slice_queryset(queryset, offset, offset + limit + 1))
+        # Judge the next page by the extra row rather than by a total
+        # that may have been cached before rows were added or removed
+        has_next = len(page) > limit
+        page = page[:limit]
 
     current_page = (offset // limit) + 1
 
@@ -31,7 +304,85 @@ def paginate_queryset(queryset, request):
         'totalPages': (total_items + limit - 1) // limit,
         'limit': limit,
         'hasPrevious': offset > 0,
-        'hasNext': offset + limit < total_items,
+        'hasNext': has_next,
+    }
+
+    return page, pagination_data
+
+
+def _encode_cursor(order_value, pk):
+    payload = json.dumps([str(order_value), str(pk)]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def _decode_cursor(cursor, order_field, pk_field):
+    """
+    Return the (order value, pk) encoded in cursor, raising ValueError if
+    it isn't a cursor this module issued.
+    """
+    try:
+        order_value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return order_field.to_python(order_value), pk_field.to_python(pk)
+    except (binascii.Error, TypeError, ValueError, ValidationError):
+        raise ValueError("Invalid cursor")
+
+
+def paginate_queryset_keyset(queryset, request):
+    """
+    Paginate by seeking past the position given in the `after` query
+    parameter, instead of making the database skip `offset` rows.
+
+    Rows are ordered by the queryset's first ordering field with the
+    primary key as tie-breaker. The first page is the one without
+    `after`. `nextCursor` in the pagination data encodes the last row's
+    ordering value and primary key, and is the value to send as `after`
+    for the next page. It is None on the last page. The cursor is applied
+    as a filter directly, so it stays valid when its row is deleted.
+
+    Raises ValueError if `after` is malformed.
+    """
+    params = getattr(request, 'query_params', request.GET)
+    after = params.get('after')
+    limit = _parse_int(params.get('limit'), 10, lo=1, hi=100)
+
+    ordering = queryset.query.order_by or queryset.model._meta.ordering or ['pk']
+    order_field = ordering[0]
+    descending = order_field.startswith('-')
+    order_name = order_field.lstrip('-')
+    opts = queryset.model._meta
+    pk_field = opts.pk
+    model_field = pk_field if order_name == 'pk' else opts.get_field(order_name)
+
+    # Annotate the ordering value, so the next cursor can be built even
+    # when the caller deferred that field
+    queryset = queryset.annotate(_cursor_value=F(order_name)).order_by(
+        order_field, '-pk' if descending else 'pk'
+    )
+
+    if after:
+        cursor_value, cursor_pk = _decode_cursor(after, model_field, pk_field)
+        lookup = 'lt' if descending else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{order_name}__{lookup}': cursor_value})
+            | Q(**{order_name: cursor_value, f'pk__{lookup}': cursor_pk})
+        )
+
+    # Fetch one extra row to learn whether there is a next page
+    rows = list(queryset[:limit + 1])
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_next:
+        next_cursor = _encode_cursor(rows[-1]._cursor_value, rows[-1].pk)
+    for row in rows:
+        del row._cursor_value
+
+    pagination_data = {
+        'limit': limit,
+        'hasPrevious': bool(after),
+        'hasNext': has_next,
+        'nextCursor': next_cursor,
     }
 
-    return queryset, pagination_data
\ No newline at end of file
+    return rows, pagination_data
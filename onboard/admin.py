@@ -29,10 +29,8 @@ class DataspaceUserAdmin(BaseUserAdmin, admin.ModelAdmin):
         "name",
     )
     list_filter = (
-        "email",
         "is_staff",
         "is_active",
-        "name",
     )
     fieldsets = (
         (None, {"fields": ("email", "password")}),
@@ -65,7 +63,7 @@ class DataspaceUserAdmin(BaseUserAdmin, admin.ModelAdmin):
             },
         ),
     )
-    search_fields = ("email",)
+    search_fields = ("email", "name")
     ordering = ("email",)
 
 
@@ -14,4 +14,7 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
             return True
 
         # Write permissions are only allowed to the owner of the snippet.
-        return obj.email == request.user.email
+        # Compare primary keys, and FK ids for objects owned through an
+        # admin field, so the owner is never loaded just for the check
+        owner_id = getattr(obj, "admin_id", obj.pk)
+        return owner_id == request.user.pk
@@ -8,7 +8,9 @@ UserModel = get_user_model()
 
 
 class RegisterDataspaceUserSerializer(serializers.ModelSerializer):
-    password = serializers.CharField(write_only=True)
+    password = serializers.CharField(
+        write_only=True, style={"input_type": "password"}
+    )
 
     class Meta:
         model = DataspaceUser
@@ -26,11 +28,12 @@ class DataspaceUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = DataspaceUser
         fields = ["id", "email", "name"]
+        read_only_fields = ["id", "email"]
     
     def update(self, admin, validated_data):
         # Update only the "name" field if provided in the request
         admin.name = validated_data.get('name', admin.name)
-        admin.save()
+        admin.save(update_fields=["name"])
         return admin
 
 
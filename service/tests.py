@@ -1,3 +1,135 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from uuid import uuid4
 
-# Create your tests here.
+from django.db import connection
+from django.test import RequestFactory, TestCase
+
+from config.models import DataSource
+from config.tests import create_datasource
+from dataspace_backend.utils import invalidate_pagination_count, paginate_queryset
+
+
+class DataSourcesPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(5):
+            create_datasource(f"source{index}@example.com")
+        cls.ordered_ids = [
+            str(pk)
+            for pk in DataSource.objects.order_by("createdAt", "pk").values_list(
+                "id", flat=True
+            )
+        ]
+
+    def list_data_sources(self, **params):
+        return self.client.get("/service/data-sources/", params)
+
+    def test_keyset_walk_returns_every_row_once(self):
+        response = self.list_data_sources(mode="keyset", limit=2)
+        pagination = response.json()["pagination"]
+        self.assertFalse(pagination["hasPrevious"])
+        self.assertIsNotNone(pagination["nextCursor"])
+
+        ids = []
+        while True:
+            body = response.json()
+            ids += [item["dataSource"]["id"] for item in body["dataSources"]]
+            cursor = body["pagination"]["nextCursor"]
+            if cursor is None:
+                break
+            response = self.list_data_sources(after=cursor, limit=2)
+            self.assertTrue(response.json()["pagination"]["hasPrevious"])
+
+        self.assertEqual(ids, self.ordered_ids)
+        self.assertFalse(body["pagination"]["hasNext"])
+
+    def test_keyset_walk_survives_deleting_the_cursor_row(self):
+        pagination = self.list_data_sources(mode="keyset", limit=2).json()["pagination"]
+        DataSource.objects.filter(pk=self.ordered_ids[1]).delete()
+
+        response = self.list_data_sources(after=pagination["nextCursor"], limit=2)
+        self.assertEqual(response.status_code, 200)
+        ids = [item["dataSource"]["id"] for item in response.json()["dataSources"]]
+        self.assertEqual(ids, self.ordered_ids[2:4])
+
+    def test_keyset_page_skips_the_cursor_lookup(self):
+        cursor = self.list_data_sources(mode="keyset", limit=2).json()["pagination"][
+            "nextCursor"
+        ]
+        request = RequestFactory().get("/", {"after": cursor, "limit": 2})
+
+        with self.assertNumQueries(1):
+            page, _ = paginate_queryset(DataSource.objects.order_by("createdAt"), request)
+        self.assertEqual([str(row.id) for row in page], self.ordered_ids[2:4])
+
+    def test_malformed_cursor_is_rejected(self):
+        for after in (str(uuid4()), "not-a-cursor", "WyJ4Il0="):
+            response = self.list_data_sources(after=after, limit=2)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {"error": "Invalid cursor"})
+
+    def test_probe_mode_skips_the_total(self):
+        pagination = self.list_data_sources(mode="probe", limit=2).json()["pagination"]
+        self.assertIsNone(pagination["totalItems"])
+        self.assertIsNone(pagination["totalPages"])
+        self.assertTrue(pagination["hasNext"])
+
+        body = self.list_data_sources(mode="probe", limit=2, offset=4).json()
+        self.assertEqual(len(body["dataSources"]), 1)
+        self.assertFalse(body["pagination"]["hasNext"])
+
+    def test_limit_zero_is_clamped_to_one(self):
+        body = self.list_data_sources(limit=0).json()
+        self.assertEqual(len(body["dataSources"]), 1)
+        self.assertEqual(body["pagination"]["limit"], 1)
+        self.assertEqual(body["pagination"]["totalPages"], 5)
+
+    def test_total_is_not_cached_in_a_process_local_cache(self):
+        self.assertEqual(self.list_data_sources().json()["pagination"]["totalItems"], 5)
+
+        create_datasource("source5@example.com")
+        self.assertEqual(self.list_data_sources().json()["pagination"]["totalItems"], 6)
+
+    def test_total_is_cached_in_a_shared_cache_until_invalidated(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        shared_cache = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": cache_dir,
+            }
+        }
+        with self.settings(CACHES=shared_cache):
+            self.assertEqual(
+                self.list_data_sources().json()["pagination"]["totalItems"], 5
+            )
+
+            create_datasource("source5@example.com")
+            pagination = self.list_data_sources(offset=4, limit=1).json()["pagination"]
+            self.assertEqual(pagination["totalItems"], 5)
+            # The extra row still reveals the page added since
+            self.assertTrue(pagination["hasNext"])
+
+            invalidate_pagination_count(DataSource)
+            self.assertEqual(
+                self.list_data_sources().json()["pagination"]["totalItems"], 6
+            )
+
+    def test_uncached_total_is_read_with_the_page(self):
+        if not connection.features.supports_over_clause:
+            self.skipTest("Database has no window functions")
+        queryset = DataSource.objects.order_by("createdAt")
+        request = RequestFactory().get("/", {"limit": 2, "offset": 2})
+
+        with self.assertNumQueries(1):
+            page, pagination = paginate_queryset(queryset, request)
+        self.assertEqual([str(row.id) for row in page], self.ordered_ids[2:4])
+        self.assertEqual(pagination["totalItems"], 5)
+
+        # Past the last row the window has nothing to read the total from
+        request = RequestFactory().get("/", {"offset": 10})
+        page, pagination = paginate_queryset(queryset, request)
+        self.assertEqual(list(page), [])
+        self.assertEqual(pagination["totalItems"], 5)
@@ -1,12 +1,14 @@
 from django.shortcuts import render
-from rest_framework.views import View
-from config.models import DataSource, ImageModel, Verification
-from config.serializers import VerificationSerializer, DataSourceSerializer
-from django.http import JsonResponse, HttpResponse
 from rest_framework import status
+from rest_framework.views import View
+from config.models import DataSource, Verification
+from config.serializers import (DataSourceSerializer, VerificationSerializer,
+                                empty_verification_data)
+from django.http import JsonResponse
 from data_disclosure_agreement.models import DataDisclosureAgreement
-from data_disclosure_agreement.serializers import DataDisclosureAgreementsSerializer
-from dataspace_backend.utils import paginate_queryset
+from data_disclosure_agreement.serializers import DataDisclosureAgreementSerializer
+from dataspace_backend.image_utils import get_image_response
+from dataspace_backend.utils import get_instance_or_400, paginate_queryset
 
 
 # Create your views here.
@@ -15,45 +17,27 @@ from dataspace_backend.utils import paginate_queryset
 class DataSourceCoverImageView(View):
 
     def get(self, request, dataSourceId):
-        try:
-            # Get the DataSource instance
-            datasource = DataSource.objects.get(pk=dataSourceId)
-        except DataSource.DoesNotExist:
-            return JsonResponse(
-                {"error": "Data source not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
-
-        try:
-            image = ImageModel.objects.get(pk=datasource.coverImageId)
-        except ImageModel.DoesNotExist:
-            return JsonResponse(
-                {"error": "Cover image not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
+        datasource, error_response = get_instance_or_400(
+            DataSource, dataSourceId, "Data source not found"
+        )
+        if error_response is not None:
+            return error_response
 
         # Return the binary image data as the HTTP response
-        return HttpResponse(image.image_data, content_type="image/jpeg")
+        return get_image_response(request, datasource.coverImageId, "Cover image not found")
 
 
 class DataSourceLogoImageView(View):
 
     def get(self, request, dataSourceId):
-        try:
-            # Get the DataSource instance
-            datasource = DataSource.objects.get(pk=dataSourceId)
-        except DataSource.DoesNotExist:
-            return JsonResponse(
-                {"error": "Data source not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
-
-        try:
-            image = ImageModel.objects.get(pk=datasource.logoId)
-        except ImageModel.DoesNotExist:
-            return JsonResponse(
-                {"error": "Logo image not found"}, status=status.HTTP_400_BAD_REQUEST
-            )
+        datasource, error_response = get_instance_or_400(
+            DataSource, dataSourceId, "Data source not found"
+        )
+        if error_response is not None:
+            return error_response
 
         # Return the binary image data as the HTTP response
-        return HttpResponse(image.image_data, content_type="image/jpeg")
+        return get_image_response(request, datasource.logoId, "Logo image not found")
 
 
 class DataSourcesView(View):
@@ -65,7 +49,14 @@ class DataSourcesView(View):
         else:
             data_sources = DataSource.objects.all().order_by("createdAt")
 
-        data_sources, pagination_data = paginate_queryset(data_sources, request)
+        # Only load the columns the listing serialises
+        data_sources = data_sources.only(*DataSourceSerializer.Meta.fields)
+
+        try:
+            data_sources, pagination_data = paginate_queryset(data_sources, request)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         serialized_data_sources = []
         for data_source in data_sources:
 
@@ -81,32 +72,21 @@ class DataSourcesView(View):
                     data_source_id=data_source.id,
                 )
 
-                data_disclosure_agreement_serializer = (
-                    DataDisclosureAgreementsSerializer(dda_for_template_id)
-                )
-                dda = data_disclosure_agreement_serializer.data[
-                    "dataDisclosureAgreementRecord"
-                ]
+                # serializer.data builds a new dict on every access
+                dda_data = DataDisclosureAgreementSerializer(dda_for_template_id).data
+                dda = dda_data["dataDisclosureAgreementRecord"]
 
                 if dda:
-                    dda["status"] = data_disclosure_agreement_serializer.data["status"]
-                    dda["isLatestVersion"] = data_disclosure_agreement_serializer.data[
-                        "isLatestVersion"
-                    ]
+                    dda["status"] = dda_data["status"]
+                    dda["isLatestVersion"] = dda_data["isLatestVersion"]
                     ddas.append(dda)
 
-            try:
-                verification = Verification.objects.get(dataSourceId=data_source)
+            verification = Verification.objects.filter(dataSourceId=data_source).first()
+            if verification is not None:
                 verification_serializer = VerificationSerializer(verification)
                 verification_data = verification_serializer.data
-            except Verification.DoesNotExist:
-                verification_data = {
-                    "id": "",
-                    "dataSourceId": "",
-                    "presentationExchangeId": "",
-                    "presentationState": "",
-                    "presentationRecord": {},
-                }
+            else:
+                verification_data = empty_verification_data()
 
             datasource_serializer = DataSourceSerializer(data_source)
 
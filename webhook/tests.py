@@ -1,3 +1,167 @@
+import json
+
 from django.test import TestCase
 
-# Create your tests here.
+from config.models import Verification
+from config.tests import create_datasource
+from connection.models import Connection
+from data_disclosure_agreement.models import DataDisclosureAgreement
+
+DDA_RECORD = {
+    "language": "en",
+    "version": "1.0.0",
+    "dataController": {},
+    "agreementPeriod": 365,
+    "dataSharingRestrictions": {},
+    "purpose": "purpose",
+    "purposeDescription": "description",
+    "lawfulBasis": "consent",
+    "personalData": [],
+    "codeOfConduct": "",
+}
+
+
+def post_webhook(client, topic, payload):
+    body = payload if isinstance(payload, bytes) else json.dumps(payload)
+    return client.post(
+        f"/webhook/topic/{topic}/", body, content_type="application/json"
+    )
+
+
+class WebhookPayloadTests(TestCase):
+
+    def test_rejects_malformed_bodies(self):
+        for topic in (
+            "connections",
+            "present_proof",
+            "published_data_disclosure_agreement",
+        ):
+            for body in (b"not json", b"[]", b"null", {}):
+                with self.subTest(topic=topic, body=body):
+                    response = post_webhook(self.client, topic, body)
+                    self.assertEqual(response.status_code, 400)
+
+    def test_rejects_missing_keys(self):
+        response = post_webhook(self.client, "connections", {"connection_id": "c1"})
+        self.assertEqual(response.status_code, 400)
+
+        response = post_webhook(self.client, "present_proof", {"state": "verified"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_incomplete_data_disclosure_agreements(self):
+        payload = {
+            "connection_id": "c1",
+            "template_id": "t1",
+            "connection_url": "https://example.com/invitation",
+        }
+        incomplete_record = dict(DDA_RECORD)
+        del incomplete_record["purpose"]
+
+        for dda in ("not an object", incomplete_record):
+            with self.subTest(dda=dda):
+                response = post_webhook(
+                    self.client,
+                    "published_data_disclosure_agreement",
+                    dict(payload, dda=dda),
+                )
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(DataDisclosureAgreement.objects.exists())
+
+    def test_stores_a_published_data_disclosure_agreement(self):
+        datasource, _ = create_datasource("first@example.com")
+        Connection.objects.create(
+            dataSourceId=datasource,
+            connectionId="c1",
+            connectionState="active",
+            connectionRecord={},
+        )
+
+        response = post_webhook(
+            self.client,
+            "published_data_disclosure_agreement",
+            {
+                "connection_id": "c1",
+                "template_id": "t1",
+                "connection_url": "https://example.com/invitation",
+                "dda": DDA_RECORD,
+            },
+        )
+
+        self.assertEqual(response.status_code, 200)
+        dda = DataDisclosureAgreement.objects.get(templateId="t1")
+        self.assertEqual(dda.dataSourceId_id, datasource.id)
+        self.assertTrue(dda.isLatestVersion)
+
+    def test_verified_presentation_is_not_overwritten(self):
+        datasource, _ = create_datasource("first@example.com")
+        Verification.objects.create(
+            dataSourceId=datasource,
+            presentationExchangeId="p1",
+            presentationState="verified",
+            presentationRecord={},
+        )
+
+        response = post_webhook(
+            self.client,
+            "present_proof",
+            {"presentation_exchange_id": "p1", "state": "request_sent"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        verification = Verification.objects.get(presentationExchangeId="p1")
+        self.assertEqual(verification.presentationState, "verified")
+
+
+class ReceiveInvitationTests(TestCase):
+
+    def setUp(self):
+        self.datasource, _ = create_datasource("first@example.com")
+        self.other_datasource, _ = create_datasource("second@example.com")
+        for connection_id, datasource, state in (
+            ("old", self.datasource, "active"),
+            ("new", self.datasource, "invitation"),
+            ("other", self.other_datasource, "active"),
+        ):
+            Connection.objects.create(
+                dataSourceId=datasource,
+                connectionId=connection_id,
+                connectionState=state,
+                connectionRecord={},
+            )
+
+    def test_activation_replaces_the_active_connection(self):
+        payload = {"connection_id": "new", "state": "active"}
+
+        response = post_webhook(self.client, "connections", payload)
+
+        self.assertEqual(response.status_code, 200)
+        connection = Connection.objects.get(dataSourceId=self.datasource)
+        self.assertEqual(connection.connectionId, "new")
+        self.assertEqual(connection.connectionState, "active")
+        self.assertEqual(connection.connectionRecord, payload)
+        # Other data sources keep their active connection
+        self.assertTrue(Connection.objects.filter(connectionId="other").exists())
+
+    def test_repeated_activation_keeps_the_connection(self):
+        payload = {"connection_id": "new", "state": "active"}
+        post_webhook(self.client, "connections", payload)
+
+        response = post_webhook(self.client, "connections", payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            Connection.objects.filter(connectionId="new", connectionState="active").exists()
+        )
+
+    def test_ignores_other_states_and_unknown_connections(self):
+        for payload in (
+            {"connection_id": "new", "state": "request"},
+            {"connection_id": "unknown", "state": "active"},
+        ):
+            response = post_webhook(self.client, "connections", payload)
+            self.assertEqual(response.status_code, 200)
+
+        states = dict(Connection.objects.values_list("connectionId", "connectionState"))
+        self.assertEqual(
+            states, {"old": "active", "new": "invitation", "other": "active"}
+        )
@@ -1,38 +1,76 @@
 from django.views.decorators.http import require_POST
+from django.db import transaction
 from django.http import HttpResponse
-from config.models import Verification
+from config.models import DataSource, Verification
 from connection.models import Connection
 from rest_framework import status
 from django.views.decorators.csrf import csrf_exempt
 import json
 from data_disclosure_agreement.models import DataDisclosureAgreement
+from dataspace_backend.utils import invalidate_pagination_count
 from django.db.models.signals import post_save
 from data_disclosure_agreement.signals import (
     query_ddas_and_update_is_latest_flag_to_false_for_previous_versions,
 )
 
 
+# Keys each webhook reads from its payload
+VERIFICATION_REQUIRED_KEYS = frozenset({"presentation_exchange_id", "state"})
+INVITATION_REQUIRED_KEYS = frozenset({"connection_id", "state"})
+DDA_REQUIRED_KEYS = frozenset({"connection_id", "template_id", "connection_url", "dda"})
+DDA_RECORD_REQUIRED_KEYS = frozenset(
+    {
+        "language",
+        "version",
+        "dataController",
+        "agreementPeriod",
+        "dataSharingRestrictions",
+        "purpose",
+        "purposeDescription",
+        "lawfulBasis",
+        "personalData",
+        "codeOfConduct",
+    }
+)
+
+
+def load_webhook_payload(request, required_keys, required_dda_keys=frozenset()):
+    """
+    Return the JSON object posted to a webhook, or None if the body isn't
+    a JSON object carrying all of required_keys (and required_dda_keys in
+    its "dda" object), so malformed events are rejected before any query.
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return None
+    if not isinstance(payload, dict) or required_keys - payload.keys():
+        return None
+    if required_dda_keys:
+        dda = payload["dda"]
+        if not isinstance(dda, dict) or required_dda_keys - dda.keys():
+            return None
+    return payload
+
+
 # Create your views here.
 @csrf_exempt
 @require_POST
 def verify_certificate(request):
-    response = request.body
-    response = json.loads(response)
+    response = load_webhook_payload(request, VERIFICATION_REQUIRED_KEYS)
+    if response is None:
+        return HttpResponse(status=status.HTTP_400_BAD_REQUEST)
     presentation_exchange_id = response["presentation_exchange_id"]
     presentation_state = response["state"]
     presentation_record = response
-    try:
-        verification = Verification.objects.get(
-            presentationExchangeId=presentation_exchange_id
-        )
-    except Verification.DoesNotExist:
-        verification = None
-
-    if verification:
-        if verification.presentationState != "verified":
-            verification.presentationState = presentation_state
-            verification.presentationRecord = presentation_record
-            verification.save()
+    # A single conditional UPDATE, so a concurrent event can't overwrite
+    # a verification between reading and saving it
+    Verification.objects.filter(
+        presentationExchangeId=presentation_exchange_id
+    ).exclude(presentationState="verified").update(
+        presentationState=presentation_state,
+        presentationRecord=presentation_record,
+    )
 
     return HttpResponse(status=status.HTTP_200_OK)
 
@@ -41,28 +79,34 @@ def verify_certificate(request):
 @require_POST
 def receive_invitation(request):
 
-    response = request.body
-    response = json.loads(response)
+    response = load_webhook_payload(request, INVITATION_REQUIRED_KEYS)
+    if response is None:
+        return HttpResponse(status=status.HTTP_400_BAD_REQUEST)
     connection_id = response["connection_id"]
     connection_state = response["state"]
     connection_data = response
 
-    try:
-        connection = Connection.objects.get(connectionId=connection_id)
-    except Connection.DoesNotExist:
-        connection = None
-
-    if connection:
-        if connection_state == "active" and connection.connectionState != "active":
-            # Delete existing connections with active status for this particular data source
-            Connection.objects.filter(
-                dataSourceId=connection.dataSourceId,
-                connectionState="active"
-            ).delete()
-            # Update status of the incoming connection
-            connection.connectionState = connection_state
-            connection.connectionRecord = connection_data
-            connection.save()
+    with transaction.atomic():
+        connection = Connection.objects.filter(connectionId=connection_id).first()
+
+        if connection:
+            # Lock the data source so activations of its connections are
+            # applied one at a time, then re-read the state under the lock
+            DataSource.objects.select_for_update().only("id").get(
+                pk=connection.dataSourceId_id
+            )
+            connection.refresh_from_db(fields=["connectionState"])
+            if connection_state == "active" and connection.connectionState != "active":
+                # Delete existing connections with active status for this particular data source
+                Connection.objects.filter(
+                    dataSourceId=connection.dataSourceId_id,
+                    connectionState="active"
+                ).delete()
+                # Update status of the incoming connection
+                connection.connectionState = connection_state
+                connection.connectionRecord = connection_data
+                connection.save(update_fields=["connectionState", "connectionRecord"])
+                invalidate_pagination_count(Connection)
 
     return HttpResponse(status=status.HTTP_200_OK)
 
@@ -71,20 +115,25 @@ def receive_invitation(request):
 @require_POST
 def receive_data_disclosure_agreement(request):
 
-    response = request.body
-    response = json.loads(response)
+    response = load_webhook_payload(
+        request, DDA_REQUIRED_KEYS, DDA_RECORD_REQUIRED_KEYS
+    )
+    if response is None:
+        return HttpResponse(status=status.HTTP_400_BAD_REQUEST)
     connection_id = response["connection_id"]
     dda_version = response["dda"]["version"]
     dda_template_id = response["template_id"]
 
     dda_connection = {"invitationUrl": response["connection_url"]}
 
-    try:
-        connection = Connection.objects.get(connectionId=connection_id)
-    except Connection.DoesNotExist:
-        connection = None
+    # Only the data source id is needed from the connection
+    data_source_id = (
+        Connection.objects.filter(connectionId=connection_id)
+        .values_list("dataSourceId", flat=True)
+        .first()
+    )
 
-    if connection:
+    if data_source_id:
         data_disclosure_agreement = {
             "language": response["dda"]["language"],
             "version": response["dda"]["version"],
@@ -100,21 +149,19 @@ def receive_data_disclosure_agreement(request):
             "connection": dda_connection,
         }
 
-        # Iterate through existing DDAs and mark `isLatestVersion=false`
-        existing_ddas = DataDisclosureAgreement.objects.filter(
-            templateId=dda_template_id, isLatestVersion=True
-        )
-        for existing_dda in existing_ddas:
-            existing_dda.isLatestVersion = False
-            existing_dda.save()
-
-
-        dda = DataDisclosureAgreement.objects.create(
-            version=dda_version,
-            templateId=dda_template_id,
-            dataSourceId=connection.dataSourceId,
-            dataDisclosureAgreementRecord=data_disclosure_agreement,
-        )
-        dda.save()
+        # Commit the demotion and the new version together, so readers
+        # never see a template without a latest version
+        with transaction.atomic():
+            # Mark existing DDAs `isLatestVersion=false` in a single UPDATE
+            DataDisclosureAgreement.objects.filter(
+                templateId=dda_template_id, isLatestVersion=True
+            ).update(isLatestVersion=False)
+
+            DataDisclosureAgreement.objects.create(
+                version=dda_version,
+                templateId=dda_template_id,
+                dataSourceId_id=data_source_id,
+                dataDisclosureAgreementRecord=data_disclosure_agreement,
+            )
 
     return HttpResponse(status=status.HTTP_200_OK)